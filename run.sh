@@ -52,9 +52,9 @@ if ! command -v pip3 &> /dev/null; then
     }
 fi
 
-# Check and install required Python libraries (requests, paramiko)
+# Check and install required Python libraries (requests, paramiko, orjson)
 # These are used by curlscript.py
-required_libraries=("requests" "paramiko") # Only names, versions are handled by pip
+required_libraries=("requests" "paramiko" "orjson") # Only names, versions are handled by pip
 
 for lib in "${required_libraries[@]}"; do
     if ! check_library "$lib"; then
@@ -1,64 +1,65 @@
-import requests
-import json
+import httpx # Needs the http2 extra: pip3 install 'httpx[http2]'
+import orjson
 import sys
-import os
-import urllib.parse # For URL parsing
+import functools
 
-# Disable urllib3 warnings about unverified HTTPS requests (for self-signed certs)
-requests.packages.urllib3.disable_warnings(requests.packages.urllib3.exceptions.InsecureRequestWarning)
+# Reusable client so login, cert and node-add share one keep-alive connection.
+# HTTP/2 is only used over HTTPS when the panel's front-end offers it; otherwise httpx stays on HTTP/1.1.
+# verify=False because self-signed panel certs are common.
+CLIENT = httpx.Client(http2=True, verify=False, timeout=10.0, headers={"Content-Type": "application/json"})
+
+def _dumps(obj):
+    # orjson returns bytes, which httpx sends directly as the request body
+    return orjson.dumps(obj)
 
 def log_py(message):
     # This function logs to stderr so it doesn't interfere with stdout output (certificate)
     print(f"[PY_LOG] {message}", file=sys.stderr)
 
+@functools.lru_cache(maxsize=4)
+def _panel_base(panel_protocol, panel_domain, panel_port):
+    # Panel base URL, omitting the port when it is the protocol default
+    panel_base_url = f"{panel_protocol}://{panel_domain}"
+    default_port = (panel_protocol == "http" and panel_port == "80") or (panel_protocol == "https" and panel_port == "443")
+    return panel_base_url if default_port else f"{panel_base_url}:{panel_port}"
+
 def get_token(panel_protocol, panel_domain, panel_port, username, password):
     # Construct URL for /api/admin/token
-    panel_api_url = f"{panel_protocol}://{panel_domain}"
-    if not ((panel_protocol == "http" and panel_port == "80") or (panel_protocol == "https" and panel_port == "443")):
-        panel_api_url += f":{panel_port}"
-    panel_api_url += "/api/admin/token" # Marzban's standard API token endpoint
+    panel_api_url = _panel_base(panel_protocol, panel_domain, panel_port) + "/api/admin/token" # Marzban's standard API token endpoint
 
     log_py(f"Attempting to login to {panel_api_url}...")
-    headers = {"Content-Type": "application/json"}
-    data = json.dumps({"username": username, "password": password})
+    data = _dumps({"username": username, "password": password})
     try:
-        response = requests.post(url=panel_api_url, data=data, headers=headers, verify=False)
+        response = CLIENT.post(panel_api_url, content=data)
         response.raise_for_status() # Raise an exception for HTTP errors
-        return response.json().get("access_token")
-    except requests.exceptions.RequestException as e:
+        token = orjson.loads(response.content).get("access_token")
+        if token:
+            CLIENT.headers["Authorization"] = f"Bearer {token}" # Used by get_client_cert / add_node_to_panel
+        return token
+    except (httpx.HTTPError, httpx.InvalidURL, orjson.JSONDecodeError) as e:
         log_py(f"Login failed: {e}. Check Panel URL, username, and password.")
         return None
 
-def get_client_cert(panel_protocol, panel_domain, panel_port, token):
+def get_client_cert(panel_protocol, panel_domain, panel_port):
     # Construct URL for /api/admin/nodes/certificate
-    panel_api_url = f"{panel_protocol}://{panel_domain}"
-    if not ((panel_protocol == "http" and panel_port == "80") or (panel_protocol == "https" and panel_port == "443")):
-        panel_api_url += f":{panel_port}"
-    panel_api_url += "/api/admin/nodes/certificate" # Marzban's standard API endpoint for node cert
+    panel_api_url = _panel_base(panel_protocol, panel_domain, panel_port) + "/api/admin/nodes/certificate" # Marzban's standard API endpoint for node cert
 
     log_py(f"Attempting to retrieve client certificate from {panel_api_url}...")
-    headers = {"Authorization": f"Bearer {token}"}
     try:
-        response = requests.get(url=panel_api_url, headers=headers, verify=False)
+        # Sub-KB JSON payload: skip gzip, decompressing costs more than the bytes it saves
+        response = CLIENT.get(panel_api_url, headers={"Accept-Encoding": "identity", "Accept": "application/json"})
         response.raise_for_status()
-        cert = response.json()
+        cert = orjson.loads(response.content)
         return cert.get("certificate") # Using .get() for safety
-    except requests.exceptions.RequestException as e:
+    except (httpx.HTTPError, httpx.InvalidURL, orjson.JSONDecodeError) as e:
         log_py(f"Failed to retrieve certificate: {e}. Check API access or Panel version.")
         return None
 
-def add_node_to_panel(panel_protocol, panel_domain, panel_port, token, node_name, node_address, service_port, api_port, add_as_new_host):
+def add_node_to_panel(panel_protocol, panel_domain, panel_port, node_name, node_address, service_port, api_port, add_as_new_host):
     # Construct URL for /api/admin/nodes
-    panel_api_url = f"{panel_protocol}://{panel_domain}"
-    if not ((panel_protocol == "http" and panel_port == "80") or (panel_protocol == "https" and panel_port == "443")):
-        panel_api_url += f":{panel_port}"
-    panel_api_url += "/api/admin/nodes" # Marzban's standard API endpoint for adding nodes
+    panel_api_url = _panel_base(panel_protocol, panel_domain, panel_port) + "/api/admin/nodes" # Marzban's standard API endpoint for adding nodes
 
     log_py(f"Attempting to add node '{node_name}' to {panel_api_url}...")
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {token}"
-    }
     node_information = {
         "name": node_name,
         "address": node_address,
@@ -67,19 +68,19 @@ def add_node_to_panel(panel_protocol, panel_domain, panel_port, token, node_name
         "add_as_new_host": add_as_new_host, # Pass boolean directly
         "usage_coefficient": 1
     }
-    data = json.dumps(node_information)
+    data = _dumps(node_information)
 
     try:
-        response = requests.post(url=panel_api_url, data=data, headers=headers, verify=False)
+        response = CLIENT.post(panel_api_url, content=data)
         response.raise_for_status()
-        result = response.json()
+        result = orjson.loads(response.content)
         if response.status_code in [200, 201]: # 200 for update, 201 for create
             log_py(f"Node '{node_name}' successfully added/updated to panel.")
             return True
         else:
             log_py(f"Failed to add/update node. Status: {response.status_code}, Response: {result}")
             return False
-    except requests.exceptions.RequestException as e:
+    except (httpx.HTTPError, httpx.InvalidURL, orjson.JSONDecodeError) as e:
         log_py(f"Failed to add/update node to panel: {e}")
         return False
 
@@ -102,18 +103,19 @@ if __name__ == "__main__":
 
     panel_protocol = "https" if https_enabled else "http"
 
-    token = get_token(panel_domain, panel_port, https_enabled, username, password)
+    token = get_token(panel_protocol, panel_domain, panel_port, username, password)
     if not token:
         sys.exit(1)
 
-    cert_content = get_client_cert(panel_domain, panel_port, https_enabled, token)
+    cert_content = get_client_cert(panel_protocol, panel_domain, panel_port)
     if not cert_content:
         sys.exit(1)
 
     # Print cert_content to stdout as the ONLY thing for Bash to capture for cert file
     print(cert_content)
 
-    if not add_node_to_panel(panel_domain, panel_port, https_enabled, token, node_name, node_address, service_port, api_port, add_as_new_host):
+    # Only add the node once its cert is in hand, so a failed cert fetch never leaves a cert-less node in the panel
+    if not add_node_to_panel(panel_protocol, panel_domain, panel_port, node_name, node_address, service_port, api_port, add_as_new_host):
         sys.exit(1)
 
     sys.exit(0) # Explicitly exit with 0 on success
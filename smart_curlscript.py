@@ -1,8 +1,14 @@
 import logging
-import json
+import argparse
+import contextlib
+import io
+import secrets
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import sys
-import os
+import shlex
 import paramiko # Imported for SSH client, though main SSH part removed, Paramiko is in requirements.
 
 # --- Configuration (These are now hardcoded values/defaults as per itsAML's curlscript) ---
@@ -10,6 +16,7 @@ import paramiko # Imported for SSH client, though main SSH part removed, Paramik
 DEFAULT_SERVICE_PORT = 62050
 DEFAULT_API_PORT = 62051
 DEFAULT_NODE_NAME_SUFFIX = "github.com/itsAML" # Suffix for node name in Marzban Panel
+SSH_STEP_MARKER = ">>> STEP: " # Echoed before each remote setup command to track progress
 
 # Configure logging
 # Logs will go to stderr so they don't interfere with stdout output (like certificate)
@@ -17,6 +24,19 @@ logging.basicConfig(level=logging.INFO, stream=sys.stderr, format='[PY_LOG] %(le
 
 # Create a reusable session
 session = requests.Session()
+# Retry transient panel errors on the pooled connection instead of aborting the whole setup.
+# Status retries are GET-only: re-sending the node-add POST after a proxy 502/504 could create it twice.
+adapter = HTTPAdapter(
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[502, 503, 504], allowed_methods=["GET"]),
+    pool_connections=2,
+    pool_maxsize=4
+)
+session.mount("https://", adapter)
+session.mount("http://", adapter)
+session.headers.update({"Accept": "application/json"})
+
+def _dumps(obj):
+    return orjson.dumps(obj) # bytes body
 
 def get_access_token(domain, port, https, username, password):
     use_protocol = 'https' if https else 'http'
@@ -30,32 +50,29 @@ def get_access_token(domain, port, https, username, password):
     try:
         response = session.post(url, data=data, verify=False) # verify=False for self-signed certs
         response.raise_for_status()
-        access_token = response.json()['access_token']
+        access_token = orjson.loads(response.content)['access_token']
+        session.headers["Authorization"] = f"Bearer {access_token}" # Sent by get_cert / add_node_to_panel
         logging.info(".:Logged in Successfully:.")
         return access_token
-    except requests.exceptions.RequestException as e:
+    except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
         logging.error(f'Error occurred while obtaining access token: {e}')
         return None
 
-def get_cert(domain, port, https, access_token):
+def get_cert(domain, port, https):
     use_protocol = 'https' if https else 'http'
     # ItsAML's script uses /api/node/settings for cert
     url = f'{use_protocol}://{domain}:{port}/api/node/settings' 
-    headers = {
-        'accept': 'application/json',
-        'Authorization': f'Bearer {access_token}'
-    }
 
     try:
-        response = session.get(url, headers=headers, verify=False)
+        response = session.get(url, headers={'Accept-Encoding': 'identity'}, verify=False) # Tiny payload, no gzip
         response.raise_for_status()
-        cert = response.json()
+        cert = orjson.loads(response.content)
         return cert["certificate"]
-    except requests.exceptions.RequestException as e:
+    except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
         logging.error(f'Error occurred while retrieving certificate: {e}')
         return None
 
-def add_node_to_panel(domain, port, https, access_token, node_name, node_address, service_port, api_port, add_as_new_host):
+def add_node_to_panel(domain, port, https, node_name, node_address, service_port, api_port, add_as_new_host):
     use_protocol = 'https' if https else 'http'
     # ItsAML's script uses /api/node for adding node
     url = f'{use_protocol}://{domain}:{port}/api/node' 
@@ -67,10 +84,8 @@ def add_node_to_panel(domain, port, https, access_token, node_name, node_address
         "add_as_new_host": True if add_as_new_host else False,
         "usage_coefficient": 1
     }
-    node_json_information = json.dumps(node_information)
+    node_json_information = _dumps(node_information)
     headers = {
-        'accept': 'application/json',
-        'Authorization': f'Bearer {access_token}',
         'Content-Type': 'application/json'
     }
 
@@ -83,127 +98,254 @@ def add_node_to_panel(domain, port, https, access_token, node_name, node_address
         logging.error(f'Error occurred while adding node to panel: {e}')
         return False
 
-def run_ssh_commands_on_node(server_ip, server_port, server_user, server_password, cert_content):
-    # This function will mimic the SSH commands that ItsAML's script originally ran
-    # But we will use fixed paths relative to home directory for Marzban-node and cert.
-
-    client = paramiko.SSHClient()
+def connect_to_node(client, server_ip, server_port, server_user, server_password):
+    # Connect an SSHClient once so the same transport can be reused for the whole node setup
     client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-
     try:
         logging.info(f"Connecting to node server {server_ip} via SSH...")
-        client.connect(server_ip, port=int(server_port), username=server_user, password=server_password, timeout=10)
+        # Password auth only: skip the agent and ~/.ssh key probes paramiko does by default
+        client.connect(server_ip, port=int(server_port), username=server_user, password=server_password, timeout=10,
+                       compress=True, allow_agent=False, look_for_keys=False)
+        client.get_transport().set_keepalive(30) # Keep the session alive through long docker/git steps
         logging.info("SSH connection established.")
+        return True
+    except ValueError:
+        logging.error(f"Invalid SSH port: {server_port}")
+        return False
+    except paramiko.AuthenticationException:
+        logging.error("SSH Authentication failed. Check username and password.")
+        return False
+    except (paramiko.SSHException, OSError) as e:
+        logging.error(f"SSH connection failed: {e}. Check server IP and port.")
+        return False
+
+def run_ssh_commands_on_node(server_ip, server_port, server_user, server_password, cert_content, client=None):
+    # This function will mimic the SSH commands that ItsAML's script originally ran
+    # But we will use fixed paths relative to home directory for Marzban-node and cert.
+    # Pass an already connected `client` to reuse its transport; otherwise a new connection is opened and closed here.
 
+    owns_client = client is None
+    if owns_client:
+        client = paramiko.SSHClient()
+        if not connect_to_node(client, server_ip, server_port, server_user, server_password):
+            client.close()
+            return False
+
+    try:
+        # Left unexpanded so `~` resolves to the SSH user's home on the node, not the local one
+        marzban_node_dir = "~/Marzban-node"
+        # Unique name in the SSH user's home (SFTP paths are relative to it), so other users on the node can't pre-create it
+        cert_upload_name = f".ssl_client_cert.{secrets.token_hex(8)}.pem"
         commands = [
             'sudo ufw disable', # Disable firewall (optional but common in scripts)
             'curl -fsSL https://get.docker.com | sh', # Install Docker
-            f'[ -d {os.path.expanduser("~")}/Marzban-node ] && sudo rm -rf {os.path.expanduser("~")}/Marzban-node', # Remove old Marzban-node dir
-            f'git clone https://github.com/Gozargah/Marzban-node {os.path.expanduser("~")}/Marzban-node', # Clone Marzban-node
+            f'sudo rm -rf {marzban_node_dir}', # Remove old Marzban-node dir (no-op if it does not exist)
+            f'git clone https://github.com/Gozargah/Marzban-node {marzban_node_dir}', # Clone Marzban-node
             # The following command sequence in ItsAML's original script
             # cd Marzban-node && docker compose up -d && docker compose down && rm docker-compose.yml
             # is for initial setup. We will run it to ensure base image is pulled.
-            f'cd {os.path.expanduser("~")}/Marzban-node && sudo docker compose up -d && sudo docker compose down',
-            f'sudo rm -f {os.path.expanduser("~")}/Marzban-node/docker-compose.yml', # Remove the temp docker-compose.yml
+            f'cd {marzban_node_dir} && sudo docker compose up -d && sudo docker compose down',
+            f'sudo rm -f {marzban_node_dir}/docker-compose.yml', # Remove the temp docker-compose.yml
             f'sudo mkdir -p /var/lib/marzban-node', # Ensure this directory exists on remote node
-            f'sudo echo "{cert_content}" > /var/lib/marzban-node/ssl_client_cert.pem', # Save cert to fixed path
+            f'sudo install -m 644 ~/{cert_upload_name} /var/lib/marzban-node/ssl_client_cert.pem', # Install the SFTP-uploaded cert as root with a fixed mode
+            f'rm -f ~/{cert_upload_name}', # Remove the uploaded copy
             # Recreate docker-compose.yml with a default single marzban-node service.
             # This will be overwritten/merged later by our main bash script if multiple nodes are needed.
-            f'cd {os.path.expanduser("~")}/Marzban-node && sudo bash -c \'echo "services:\n  marzban-node:\n    image: gozargah/marzban-node:latest\n    restart: always\n    network_mode: host\n    environment:\n      SSL_CLIENT_CERT_FILE: \\"/var/lib/marzban-node/ssl_client_cert.pem\\"\n      SERVICE_PORT: \\"{DEFAULT_SERVICE_PORT}\\"\n      XRAY_API_PORT: \\"{DEFAULT_API_PORT}\\"\n    volumes:\n      - /var/lib/marzban-node:/var/lib/marzban-node\n      - /var/lib/marzban:/var/lib/marzban" > docker-compose.yml && sudo docker compose up -d\''
+            f'cd {marzban_node_dir} && sudo bash -c \'echo "services:\n  marzban-node:\n    image: gozargah/marzban-node:latest\n    restart: always\n    network_mode: host\n    environment:\n      SSL_CLIENT_CERT_FILE: \\"/var/lib/marzban-node/ssl_client_cert.pem\\"\n      SERVICE_PORT: \\"{DEFAULT_SERVICE_PORT}\\"\n      XRAY_API_PORT: \\"{DEFAULT_API_PORT}\\"\n    volumes:\n      - /var/lib/marzban-node:/var/lib/marzban-node\n      - /var/lib/marzban:/var/lib/marzban" > docker-compose.yml && sudo docker compose up -d\''
         ]
 
-        for command in commands:
-            logging.info(f"Executing SSH command: {command}")
-            stdin, stdout, stderr = client.exec_command(command)
-            stdout_output = stdout.read().decode('utf-8').strip()
-            stderr_output = stderr.read().decode('utf-8').strip()
-            exit_status = stdout.channel.recv_exit_status()
+        # Upload the cert over SFTP on the existing transport; binary-safe, unlike echoing the PEM through the shell
+        logging.info("Uploading client certificate to node via SFTP...")
+        sftp = client.open_sftp()
+        try:
+            sftp.putfo(io.BytesIO(cert_content.encode('utf-8')), cert_upload_name)
 
-            if exit_status == 0:
-                logging.info(f"Command executed successfully. Output: {stdout_output}")
-            else:
-                logging.error(f"Command failed with exit status {exit_status}. Error: {stderr_output}")
-                raise Exception(f"SSH command failed: {command}")
+            # Run every command in one remote shell instead of opening a channel per command.
+            # `set -e` does not apply inside `&&` lists, so each entry gets an explicit `|| exit $?` to stay
+            # fail-fast like the old per-command loop. A marker line is echoed before each step so a failure
+            # can be attributed to the command that caused it.
+            script_lines = ["set -o pipefail"]
+            for command in commands:
+                script_lines.append(f"echo {shlex.quote(SSH_STEP_MARKER + command)}")
+                script_lines.append(f"{command} || exit $?")
+            script = "\n".join(script_lines) + "\n"
+            logging.info(f"Executing {len(commands)} SSH commands in a single session...")
+            channel = client.get_transport().open_session()
+            # Merge stderr into stdout so git/docker progress output can be streamed from one pipe
+            # without the unread stream stalling the SSH window.
+            channel.set_combine_stderr(True)
+            channel.exec_command(f'bash -c {shlex.quote(script)}')
+            output = channel.makefile('rb', 4096)
+            current_step = None
+            for line in iter(output.readline, b''):
+                text = line.decode('utf-8', errors='replace').rstrip()
+                if text.startswith(SSH_STEP_MARKER):
+                    current_step = text[len(SSH_STEP_MARKER):]
+                    logging.info(f"Executing SSH command: {current_step}")
+                else:
+                    logging.info(f"[node] {text}")
+            exit_status = channel.recv_exit_status()
+            channel.close()
+        finally:
+            # Normally removed by the script; clean up here if it stopped before that step
+            try:
+                sftp.remove(cert_upload_name)
+            except IOError:
+                pass
+            sftp.close()
+
+        if exit_status == 0:
+            logging.info("Commands executed successfully.")
+        else:
+            logging.error(f"Command failed with exit status {exit_status}: {current_step}")
+            raise Exception(f"SSH command failed: {current_step}")
 
-    except paramiko.AuthenticationException:
-        logging.error("SSH Authentication failed. Check username and password.")
-        return False
     except paramiko.SSHException as e:
-        logging.error(f"SSH connection failed: {e}. Check server IP and port.")
+        logging.error(f"SSH session failed: {e}.")
         return False
     except Exception as e:
         logging.error(f"Error during SSH command execution: {e}")
         return False
     finally:
-        client.close()
-        logging.info("SSH connection closed.")
+        if owns_client:
+            client.close()
+            logging.info("SSH connection closed.")
     return True
 
-# --- Main execution logic when smart_curlscript.py is run directly ---
-if __name__ == "__main__":
-    # Marzban Panel Information
-    logging.info("\n--- Marzban Panel Information ---")
-    DOMAIN_INPUT = input("Please Enter Your Marzban Domain/IP: ")
-    PORT_INPUT = input("Please Enter Your Marzban Port: ")
-    USERNAME_INPUT = input("Please Enter Your Marzban Username: ")
-    PASSWORD_INPUT = input("Please Enter Your Marzban Password: ")
+def parse_args():
+    # Every prompt below has a matching option so the Bash wrapper can pass everything in one go
+    parser = argparse.ArgumentParser(description="Add a node to the Marzban panel and set up Marzban-node on it over SSH.")
+    parser.add_argument('--config', help="JSON or YAML file with any of the options below (underscored keys, e.g. server_ip)")
+    parser.add_argument('--non-interactive', action='store_true', help="Never prompt; fail if a required value is missing")
 
-    HTTPS_INPUT = True
-    while True:
-        https_if_statment = input("Are You using HTTPS/SSL? (y/n): ").lower()
-        if https_if_statment == "y":
-            break
-        elif https_if_statment == "n":
-            HTTPS_INPUT = False
-            break
-        else:
-            logging.warning("invalid value, try again...")
+    panel = parser.add_argument_group("Marzban panel")
+    panel.add_argument('--domain', help="Marzban domain/IP")
+    panel.add_argument('--port', help="Marzban port")
+    panel.add_argument('--username', help="Marzban username")
+    panel.add_argument('--password', help="Marzban password")
+    panel.add_argument('--https', choices=['y', 'n'], help="Panel uses HTTPS/SSL (default: y)")
+    panel.add_argument('--add-as-host', choices=['y', 'n'], help="Add this node as a new host for every inbound (default: y)")
+
+    server = parser.add_argument_group("Node server (SSH)")
+    server.add_argument('--server-ip', help="Node server domain/IP")
+    server.add_argument('--server-port', help="Node server SSH port (default: 22)")
+    server.add_argument('--server-user', help="Node server SSH user (default: root)")
+    server.add_argument('--server-password', help="Node server SSH password")
+
+    node = parser.add_argument_group("Node details for Marzban panel")
+    node.add_argument('--node-name', help="Unique node name in Docker/Marzban panel")
+    node.add_argument('--node-address', help="Node address shown in the panel (default: --server-ip)")
+    node.add_argument('--service-port', help=f"SERVICE_PORT for this node (default: {DEFAULT_SERVICE_PORT})")
+    node.add_argument('--api-port', help=f"XRAY_API_PORT for this node (default: {DEFAULT_API_PORT})")
+    return parser.parse_args()
+
+def load_config(path):
+    try:
+        with open(path, 'rb') as config_file:
+            raw = config_file.read()
+    except OSError as e:
+        logging.error(f"Could not read config file {path}: {e}")
+        sys.exit(1)
+
+    if path.endswith(('.yaml', '.yml')):
+        try:
+            import yaml # Only needed for YAML configs, so not a hard requirement
+        except ImportError:
+            logging.error("YAML config files need PyYAML. Install it with: pip3 install pyyaml --break-system-packages")
+            sys.exit(1)
+        try:
+            config = yaml.safe_load(raw) or {}
+        except yaml.YAMLError as e:
+            logging.error(f"Invalid YAML in config file {path}: {e}")
+            sys.exit(1)
+    else:
+        try:
+            config = orjson.loads(raw)
+        except orjson.JSONDecodeError as e:
+            logging.error(f"Invalid JSON in config file {path}: {e}")
+            sys.exit(1)
+
+    if not isinstance(config, dict):
+        logging.error(f"Config file {path} must contain an object of option names to values.")
+        sys.exit(1)
+    return config
+
+def get_option(options, name, prompt, non_interactive, default=None):
+    # Return the value from args/config, otherwise prompt for it (or fall back to the default when non-interactive)
+    value = options.get(name)
+    if value is not None and value != "":
+        return str(value)
+    if non_interactive:
+        if default is None:
+            logging.error(f"Missing required option --{name.replace('_', '-')} in non-interactive mode.")
+            sys.exit(1)
+        return default
+    answer = input(prompt)
+    return default if answer == "" and default is not None else answer
 
-    ADD_AS_HOST_INPUT = True
+def get_yes_no_option(options, name, prompt, non_interactive, default=True):
+    value = options.get(name)
+    if isinstance(value, bool):
+        return value
+    if value is not None:
+        value = str(value).lower()
+        if value in ("y", "yes", "true", "1"):
+            return True
+        if value in ("n", "no", "false", "0"):
+            return False
+        logging.error(f"Invalid value for --{name.replace('_', '-')}: {value}")
+        sys.exit(1)
+    if non_interactive:
+        return default
     while True:
-        host_if_statment = input("Do you Want To Add This Node as a New Host For Every Inbound (y/n): ").lower()
-        if host_if_statment == "y":
-            break
-        elif host_if_statment == "n":
-            ADD_AS_HOST_INPUT = False
-            break
+        answer = input(prompt).lower()
+        if answer == "y":
+            return True
+        elif answer == "n":
+            return False
         else:
             logging.warning("invalid value, try again...")
 
+# --- Main execution logic when smart_curlscript.py is run directly ---
+if __name__ == "__main__":
+    args = parse_args()
+    OPTIONS = load_config(args.config) if args.config else {}
+    OPTIONS.update({key: value for key, value in vars(args).items() if value is not None and key not in ("config", "non_interactive")})
+    NON_INTERACTIVE = args.non_interactive
+
+    # Marzban Panel Information
+    logging.info("\n--- Marzban Panel Information ---")
+    DOMAIN_INPUT = get_option(OPTIONS, "domain", "Please Enter Your Marzban Domain/IP: ", NON_INTERACTIVE)
+    PORT_INPUT = get_option(OPTIONS, "port", "Please Enter Your Marzban Port: ", NON_INTERACTIVE)
+    USERNAME_INPUT = get_option(OPTIONS, "username", "Please Enter Your Marzban Username: ", NON_INTERACTIVE)
+    PASSWORD_INPUT = get_option(OPTIONS, "password", "Please Enter Your Marzban Password: ", NON_INTERACTIVE)
+    HTTPS_INPUT = get_yes_no_option(OPTIONS, "https", "Are You using HTTPS/SSL? (y/n): ", NON_INTERACTIVE)
+    ADD_AS_HOST_INPUT = get_yes_no_option(OPTIONS, "add_as_host", "Do you Want To Add This Node as a New Host For Every Inbound (y/n): ", NON_INTERACTIVE)
+
     # Node Server Configuration (for SSH connection by this script)
     logging.info("\n--- Node Server Information (for SSH connection from this script) ---")
-    SERVER_IP_INPUT = input("Please Enter Your Node Server Domain/IP (this server's IP): ")
-    SERVER_PORT_INPUT = '22'
-    while True:
-        port_input = input("Please Enter Your Node Server SSH Port (Default : 22): ")
-        if port_input == "":
-            break
-        else:
-            SERVER_PORT_INPUT = port_input
-            break
-    SERVER_USER_INPUT = 'root'
-    while True:
-        user_input = input("Please Enter Your Node Server SSH User (Default : root): ")
-        if user_input == "":
-            break
-        else:
-            SERVER_USER_INPUT = user_input
-            break
-    SERVER_PASSWORD_INPUT = input("Please Enter Your Node Server SSH password: ")
+    SERVER_IP_INPUT = get_option(OPTIONS, "server_ip", "Please Enter Your Node Server Domain/IP (this server's IP): ", NON_INTERACTIVE)
+    SERVER_PORT_INPUT = get_option(OPTIONS, "server_port", "Please Enter Your Node Server SSH Port (Default : 22): ", NON_INTERACTIVE, default='22')
+    SERVER_USER_INPUT = get_option(OPTIONS, "server_user", "Please Enter Your Node Server SSH User (Default : root): ", NON_INTERACTIVE, default='root')
+    SERVER_PASSWORD_INPUT = get_option(OPTIONS, "server_password", "Please Enter Your Node Server SSH password: ", NON_INTERACTIVE)
 
     # --- Node details for Marzban Panel (for adding node via API) ---
     logging.info("\n--- Node Details for Marzban Panel ---")
-    NODE_SERVICE_NAME = input("Enter a UNIQUE name for this node service in Docker/Marzban Panel (e.g., my-new-node): ")
-    NODE_DISPLAY_ADDRESS = input(f"Enter Node's Address for Marzban Panel (this node's public IP/domain, e.g., {SERVER_IP_INPUT}): ") or SERVER_IP_INPUT
-
-    AUTO_ASSIGN_PORTS = input("Do you want to auto-assign SERVICE_PORT and XRAY_API_PORT (y/n)? (e.g., 62050, 62051): ").lower()
-    if AUTO_ASSIGN_PORTS == 'y':
-        NODE_SERVICE_PORT = DEFAULT_SERVICE_PORT # Use fixed defaults for now, as finding free ports is complex here
-        NODE_API_PORT = DEFAULT_API_PORT
-        logging.info(f"Auto-assigned SERVICE_PORT: {NODE_SERVICE_PORT}, API_PORT: {NODE_API_PORT}")
+    NODE_SERVICE_NAME = get_option(OPTIONS, "node_name", "Enter a UNIQUE name for this node service in Docker/Marzban Panel (e.g., my-new-node): ", NON_INTERACTIVE)
+    NODE_DISPLAY_ADDRESS = get_option(OPTIONS, "node_address", f"Enter Node's Address for Marzban Panel (this node's public IP/domain, e.g., {SERVER_IP_INPUT}): ", NON_INTERACTIVE, default=SERVER_IP_INPUT)
+
+    if OPTIONS.get("service_port") or OPTIONS.get("api_port") or NON_INTERACTIVE:
+        NODE_SERVICE_PORT = get_option(OPTIONS, "service_port", "Enter SERVICE_PORT for this node: ", NON_INTERACTIVE, default=str(DEFAULT_SERVICE_PORT))
+        NODE_API_PORT = get_option(OPTIONS, "api_port", "Enter XRAY_API_PORT for this node: ", NON_INTERACTIVE, default=str(DEFAULT_API_PORT))
     else:
-        NODE_SERVICE_PORT = input("Enter SERVICE_PORT for this node: ")
-        NODE_API_PORT = input("Enter XRAY_API_PORT for this node: ")
+        AUTO_ASSIGN_PORTS = input("Do you want to auto-assign SERVICE_PORT and XRAY_API_PORT (y/n)? (e.g., 62050, 62051): ").lower()
+        if AUTO_ASSIGN_PORTS == 'y':
+            NODE_SERVICE_PORT = DEFAULT_SERVICE_PORT # Use fixed defaults for now, as finding free ports is complex here
+            NODE_API_PORT = DEFAULT_API_PORT
+            logging.info(f"Auto-assigned SERVICE_PORT: {NODE_SERVICE_PORT}, API_PORT: {NODE_API_PORT}")
+        else:
+            NODE_SERVICE_PORT = input("Enter SERVICE_PORT for this node: ")
+            NODE_API_PORT = input("Enter XRAY_API_PORT for this node: ")
 
     # Get access token
     access_token = get_access_token(DOMAIN_INPUT, PORT_INPUT, HTTPS_INPUT, USERNAME_INPUT, PASSWORD_INPUT)
@@ -211,17 +353,20 @@ if __name__ == "__main__":
         sys.exit(1)
 
     # Get client certificate
-    cert_content = get_cert(DOMAIN_INPUT, PORT_INPUT, HTTPS_INPUT, access_token)
+    cert_content = get_cert(DOMAIN_INPUT, PORT_INPUT, HTTPS_INPUT)
     if not cert_content:
         sys.exit(1)
 
     # Add node to panel
-    if not add_node_to_panel(DOMAIN_INPUT, PORT_INPUT, HTTPS_INPUT, access_token, NODE_SERVICE_NAME, NODE_DISPLAY_ADDRESS, NODE_SERVICE_PORT, NODE_API_PORT, ADD_AS_HOST_INPUT):
+    if not add_node_to_panel(DOMAIN_INPUT, PORT_INPUT, HTTPS_INPUT, NODE_SERVICE_NAME, NODE_DISPLAY_ADDRESS, NODE_SERVICE_PORT, NODE_API_PORT, ADD_AS_HOST_INPUT):
         sys.exit(1)
 
-    # Run SSH commands on the node server to set up Marzban-node
-    if not run_ssh_commands_on_node(SERVER_IP_INPUT, SERVER_PORT_INPUT, SERVER_USER_INPUT, SERVER_PASSWORD_INPUT, cert_content):
-        sys.exit(1)
+    # Run SSH commands on the node server to set up Marzban-node, reusing one SSH connection throughout
+    with contextlib.closing(paramiko.SSHClient()) as ssh_client:
+        if not connect_to_node(ssh_client, SERVER_IP_INPUT, SERVER_PORT_INPUT, SERVER_USER_INPUT, SERVER_PASSWORD_INPUT):
+            sys.exit(1)
+        if not run_ssh_commands_on_node(SERVER_IP_INPUT, SERVER_PORT_INPUT, SERVER_USER_INPUT, SERVER_PASSWORD_INPUT, cert_content, client=ssh_client):
+            sys.exit(1)
 
     logging.info("Node setup and panel addition completed successfully.")
     logging.info("Please verify the node status in your Marzban panel.")